@@ -0,0 +1,165 @@
+"""
+Response models for Blood Test Analyzer API.
+
+Defines the structured output requested from the doctor task, the typed
+payload returned by the analysis endpoints, and the helpers used to build
+it from a CrewAI result and trim it down to the fields a client asked for.
+"""
+
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import List, Literal, Optional, Set
+
+from pydantic import BaseModel, Field
+
+# Client supplied request ids must be short and header safe
+REQUEST_ID_PATTERN = re.compile(r"[\w\-]{1,128}", re.ASCII)
+
+# Fields always returned, whatever the client asks for
+ALWAYS_INCLUDED = {"status", "request_id"}
+
+
+class MarkerFlag(BaseModel):
+    """A blood marker whose value falls outside its reference range."""
+
+    marker: str = Field(description="Name of the blood marker, e.g. Hemoglobin")
+    value: str = Field(description="Measured value with its unit, e.g. 11.2 g/dL")
+    reference_range: Optional[str] = Field(
+        default=None, description="Reference range printed on the report"
+    )
+    direction: Literal["high", "low", "abnormal"] = Field(
+        description="Whether the value is above, below or otherwise outside the range"
+    )
+
+
+class DoctorReport(BaseModel):
+    """Structured output of the doctor task."""
+
+    summary: str = Field(description="Two or three plain sentences summarising the results")
+    flags: List[MarkerFlag] = Field(
+        default=[], description="Only markers that are outside their reference range"
+    )
+    analysis: str = Field(description="The full narrative analysis answering the query")
+
+
+class TaskResult(BaseModel):
+    """Output of a single agent task in the crew run."""
+
+    agent: str
+    output: str
+
+
+class AnalysisResponse(BaseModel):
+    """
+    Structured result of a blood report analysis.
+
+    ``summary`` and ``flags`` are None when the crew did not return
+    a valid DoctorReport, so clients can tell "no findings" from
+    "findings unavailable".
+    """
+
+    status: str = "success"
+    request_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    query: str
+    file_processed: str
+    summary: Optional[str] = None
+    flags: Optional[List[MarkerFlag]] = None
+    tasks: List[TaskResult] = []
+    analysis: str
+    duration_seconds: float
+
+
+def resolve_request_id(header_value: Optional[str]) -> str:
+    """
+    Pick the request id for a request.
+
+    Args:
+        header_value (str): Value of the client's X-Request-ID header, if any.
+
+    Returns:
+        str: The client id when it matches REQUEST_ID_PATTERN, else a new one.
+    """
+    if header_value is not None and REQUEST_ID_PATTERN.fullmatch(header_value):
+        return header_value
+
+    request_id = uuid.uuid4().hex
+    if header_value is not None:
+        print(f"Warning: Ignoring invalid X-Request-ID header, using {request_id}")
+    return request_id
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """
+    Parse a comma separated ``fields`` parameter.
+
+    Args:
+        fields (str): e.g. "summary,flags". Empty, None or only commas
+            means all fields.
+
+    Returns:
+        set: Field names to include, or None for the full response.
+
+    Raises:
+        ValueError: If an unknown field is requested.
+    """
+    if not fields:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        return None
+
+    unknown = requested - set(AnalysisResponse.model_fields)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Allowed: {', '.join(AnalysisResponse.model_fields)}"
+        )
+    return requested | ALWAYS_INCLUDED
+
+
+def build_analysis_response(
+    crew_output,
+    query: str,
+    file_processed: str,
+    duration_seconds: float,
+    request_id: Optional[str] = None,
+) -> AnalysisResponse:
+    """
+    Build an AnalysisResponse from a CrewAI ``CrewOutput``.
+
+    Args:
+        crew_output: Result of ``Crew.kickoff``.
+        query (str): The user query or prompt.
+        file_processed (str): Name of the analysed file.
+        duration_seconds (float): Wall time spent running the crew.
+        request_id (str): Optional id to reuse instead of generating one.
+
+    Returns:
+        AnalysisResponse: The structured response.
+    """
+    tasks = [
+        TaskResult(agent=str(task.agent), output=str(task.raw).strip())
+        for task in getattr(crew_output, "tasks_output", None) or []
+    ]
+
+    report = getattr(crew_output, "pydantic", None)
+    if isinstance(report, DoctorReport):
+        summary, flags, analysis = report.summary.strip(), report.flags, report.analysis.strip()
+    else:
+        # Structured output missing or unparsable: return the raw narrative only
+        summary, flags, analysis = None, None, str(crew_output).strip()
+
+    extra = {"request_id": request_id} if request_id else {}
+    return AnalysisResponse(
+        query=query,
+        file_processed=file_processed,
+        summary=summary,
+        flags=flags,
+        tasks=tasks,
+        analysis=analysis,
+        duration_seconds=round(duration_seconds, 3),
+        **extra,
+    )
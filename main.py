@@ -5,16 +5,27 @@ import warnings
 warnings.filterwarnings("ignore", message=".*PydanticDeprecatedSince20.*")
 
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
 import os
+import time
 import uuid
 import asyncio
 from typing import Optional
 
+from brotli_asgi import BrotliMiddleware
+
 
 from crewai import Crew, Process, Task
 from agents import doctor, verifier
+from app.schemas import AnalysisResponse, DoctorReport, build_analysis_response, parse_fields, resolve_request_id
+
+# Responses smaller than this (in bytes) are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
 
 app = FastAPI(title="Blood Test Report Analyzer")
 
@@ -25,8 +36,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Compress large analysis payloads: brotli when the client accepts it, gzip otherwise
+app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+
+@app.middleware("http")
+async def attach_request_id(request: Request, call_next):
+    """Resolve the request id once and echo it on every response, errors included"""
+    request.state.request_id = resolve_request_id(request.headers.get("X-Request-ID"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request.state.request_id
+    return response
+
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """Include the request id in error bodies"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "request_id": request.state.request_id},
+        headers=exc.headers,
+    )
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Include the request id in validation error bodies"""
+    return JSONResponse(
+        status_code=422,
+        content={"detail": jsonable_encoder(exc.errors()), "request_id": request.state.request_id},
+    )
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Include the request id in unexpected 500s"""
+    # Runs in ServerErrorMiddleware, outside attach_request_id, so set the header here too
+    request_id = getattr(request.state, "request_id", None) or resolve_request_id(request.headers.get("X-Request-ID"))
+    return JSONResponse(
+        status_code=500,
+        content={"detail": "Internal server error", "request_id": request_id},
+        headers={"X-Request-ID": request_id},
+    )
+
 # Define tasks inline (since task.py might be missing)
 verification = Task(
     description=(
@@ -49,7 +100,12 @@ help_patients = Task(
         "provide clear, understandable explanations of their blood work results."
     ),
     expected_output=(
-        "A comprehensive medical analysis including: "
+        "A structured report with three parts: "
+        "'summary': two or three plain sentences summarising the results, without headings or markdown; "
+        "'flags': one entry per blood marker outside its reference range, giving the marker name, "
+        "the measured value with unit, the reference range and whether it is high, low or abnormal "
+        "(leave empty if every marker is within range, and never list in-range markers); "
+        "'analysis': a comprehensive medical analysis including "
         "1. Summary of all blood markers and their values "
         "2. Identification of abnormal results with explanations "
         "3. Health implications and potential concerns "
@@ -58,6 +114,7 @@ help_patients = Task(
         "6. Clear answers to the patient's specific query"
     ),
     agent=doctor,
+    output_pydantic=DoctorReport,
     dependencies=[verification]  # This task depends on verification completing first
 )
 
@@ -81,6 +138,24 @@ def run_crew(query: str, file_path: str = "data/sample.pdf"):
     except Exception as e:
         raise Exception(f"Error running crew: {str(e)}")
 
+# Shared description of the ``fields`` query parameter
+FIELDS_DESCRIPTION = (
+    "Comma separated AnalysisResponse fields to return, e.g. summary,flags. "
+    "status and request_id are always included; omit for the full response."
+)
+
+def select_fields(fields: Optional[str]):
+    """Validate the ``fields`` query parameter"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def analysis_json_response(response: AnalysisResponse, include=None):
+    """Serialise an analysis response, keeping only the requested fields"""
+    # pydantic's Rust serializer encodes straight to JSON bytes in one pass
+    return Response(response.model_dump_json(include=include), media_type="application/json")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -104,11 +179,15 @@ async def health_check():
 
 @app.post("/analyze")
 async def analyze_blood_report(
+    request: Request,
     file: UploadFile = File(...),
-    query: str = Form(default="Please analyze my blood test report and provide a comprehensive summary")
+    query: str = Form(default="Please analyze my blood test report and provide a comprehensive summary"),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION)
 ):
     """Analyze blood test report and provide comprehensive health recommendations"""
     
+    include = select_fields(fields)
+    
     # Validate file type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
@@ -133,15 +212,17 @@ async def analyze_blood_report(
             query = "Please analyze my blood test report and provide a comprehensive summary"
         
         # Process the blood report with medical crew
+        started = time.perf_counter()
         response = run_crew(query=query.strip(), file_path=file_path)
         
-        return {
-            "status": "success",
-            "query": query,
-            "analysis": str(response),
-            "file_processed": file.filename,
-            "timestamp": str(uuid.uuid4())
-        }
+        result = build_analysis_response(
+            response,
+            query=query,
+            file_processed=file.filename,
+            duration_seconds=time.perf_counter() - started,
+            request_id=request.state.request_id
+        )
+        return analysis_json_response(result, include)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing blood report: {str(e)}")
@@ -156,10 +237,14 @@ async def analyze_blood_report(
 
 @app.post("/analyze-sample")
 async def analyze_sample_report(
-    query: str = Form(default="Please analyze the sample blood test report")
+    request: Request,
+    query: str = Form(default="Please analyze the sample blood test report"),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION)
 ):
     """Analyze the sample blood test report"""
     
+    include = select_fields(fields)
+    
     sample_path = "data/sample.pdf"
     
     if not os.path.exists(sample_path):
@@ -171,15 +256,17 @@ async def analyze_sample_report(
             query = "Please analyze the sample blood test report"
         
         # Process the sample blood report
+        started = time.perf_counter()
         response = run_crew(query=query.strip(), file_path=sample_path)
         
-        return {
-            "status": "success",
-            "query": query,
-            "analysis": str(response),
-            "file_processed": "sample.pdf",
-            "timestamp": str(uuid.uuid4())
-        }
+        result = build_analysis_response(
+            response,
+            query=query,
+            file_processed="sample.pdf",
+            duration_seconds=time.perf_counter() - started,
+            request_id=request.state.request_id
+        )
+        return analysis_json_response(result, include)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing sample report: {str(e)}")
@@ -0,0 +1,144 @@
+"""
+Tests for the analysis endpoints in main.py.
+
+crewai and the agents module need API keys and network access, so they are
+replaced with stubs and run_crew is swapped for a fake returning a
+CrewOutput-like object.
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Stub:
+    def __init__(self, *args, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+crewai_stub = types.ModuleType("crewai")
+crewai_stub.Crew = _Stub
+crewai_stub.Task = _Stub
+crewai_stub.Process = types.SimpleNamespace(sequential="sequential")
+agents_stub = types.ModuleType("agents")
+agents_stub.doctor = _Stub(role="Doctor")
+agents_stub.verifier = _Stub(role="Verifier")
+sys.modules.setdefault("crewai", crewai_stub)
+sys.modules.setdefault("agents", agents_stub)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from app.schemas import DoctorReport, MarkerFlag  # noqa: E402
+
+from tests.test_schemas import FakeCrewOutput, FakeTaskOutput  # noqa: E402
+
+NARRATIVE = "Detailed analysis of every marker. " * 200
+
+
+@pytest.fixture
+def client(monkeypatch):
+    report = DoctorReport(
+        summary="Mild anaemia.",
+        flags=[MarkerFlag(marker="Hemoglobin", value="11.2 g/dL", direction="low")],
+        analysis=NARRATIVE,
+    )
+    crew_output = FakeCrewOutput(
+        report.model_dump_json(),
+        pydantic=report,
+        tasks_output=[FakeTaskOutput("Verifier", "valid report")],
+    )
+    monkeypatch.setattr(main, "run_crew", lambda query, file_path: crew_output)
+    monkeypatch.chdir(REPO_ROOT)
+    return TestClient(main.app, raise_server_exceptions=False)
+
+
+def test_analyze_sample_full_response(client):
+    response = client.post("/analyze-sample", headers={"X-Request-ID": "req-1"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "req-1"
+    body = response.json()
+    assert body["request_id"] == "req-1"
+    assert body["summary"] == "Mild anaemia."
+    assert body["flags"][0]["direction"] == "low"
+    assert body["analysis"] == NARRATIVE.strip()
+    assert body["timestamp"].endswith("Z")
+
+
+def test_analyze_sample_fields_trims_body(client):
+    response = client.post("/analyze-sample?fields=summary", headers={"X-Request-ID": "req-2"})
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "request_id": "req-2", "summary": "Mild anaemia."}
+
+
+def test_analyze_sample_unknown_field_is_400_with_request_id(client):
+    response = client.post("/analyze-sample?fields=bogus", headers={"X-Request-ID": "req-3"})
+
+    assert response.status_code == 400
+    assert response.headers["X-Request-ID"] == "req-3"
+    body = response.json()
+    assert body["request_id"] == "req-3"
+    assert "Unknown fields: bogus" in body["detail"]
+
+
+def test_analyze_upload(client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    response = client.post(
+        "/analyze?fields=flags",
+        files={"file": ("report.pdf", b"%PDF-1.4 fake", "application/pdf")},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["flags"][0]["marker"] == "Hemoglobin"
+    # The uploaded file is removed after processing
+    assert os.listdir(tmp_path / "uploads") == []
+
+
+def test_analyze_missing_file_is_422_with_request_id(client):
+    response = client.post("/analyze", headers={"X-Request-ID": "req-4"})
+
+    assert response.status_code == 422
+    assert response.headers["X-Request-ID"] == "req-4"
+    assert response.json()["request_id"] == "req-4"
+
+
+def test_invalid_request_id_header_is_replaced(client):
+    response = client.post("/analyze-sample?fields=status", headers={"X-Request-ID": "bad id"})
+
+    request_id = response.headers["X-Request-ID"]
+    assert request_id != "bad id"
+    assert response.json()["request_id"] == request_id
+
+
+def test_unhandled_exception_is_500_with_request_id(client, monkeypatch):
+    def boom(fields):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, "select_fields", boom)
+    response = client.post("/analyze-sample", headers={"X-Request-ID": "req-5"})
+
+    assert response.status_code == 500
+    assert response.headers["X-Request-ID"] == "req-5"
+    assert response.json() == {"detail": "Internal server error", "request_id": "req-5"}
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_response_is_compressed(client, encoding):
+    response = client.post("/analyze-sample", headers={"Accept-Encoding": encoding})
+
+    assert len(response.content) > main.COMPRESSION_MIN_SIZE
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.json()["analysis"] == NARRATIVE.strip()
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.post("/analyze-sample?fields=summary", headers={"Accept-Encoding": "gzip, br"})
+
+    assert len(response.content) < main.COMPRESSION_MIN_SIZE
+    assert "Content-Encoding" not in response.headers
@@ -0,0 +1,128 @@
+"""
+Tests for the response helpers in app.schemas.
+"""
+
+import pytest
+
+from app.schemas import (
+    ALWAYS_INCLUDED,
+    DoctorReport,
+    MarkerFlag,
+    build_analysis_response,
+    parse_fields,
+    resolve_request_id,
+)
+
+
+class FakeTaskOutput:
+    def __init__(self, agent, raw):
+        self.agent = agent
+        self.raw = raw
+
+
+class FakeCrewOutput:
+    """Minimal stand-in for crewai's CrewOutput."""
+
+    def __init__(self, raw, pydantic=None, tasks_output=None):
+        self.raw = raw
+        self.pydantic = pydantic
+        self.tasks_output = tasks_output or []
+
+    def __str__(self):
+        return self.raw
+
+
+NARRATIVE = (
+    "# Blood Test Report Analysis\n\n"
+    "Abnormal results:\n"
+    "- Your hemoglobin is not low.\n"
+    "- Follow a low-fat diet and get high-quality sleep.\n"
+)
+
+
+def build(crew_output, request_id=None):
+    return build_analysis_response(
+        crew_output,
+        query="q",
+        file_processed="sample.pdf",
+        duration_seconds=1.23456,
+        request_id=request_id,
+    )
+
+
+@pytest.mark.parametrize("fields", [None, "", ",", " , ", " "])
+def test_parse_fields_empty_means_all(fields):
+    assert parse_fields(fields) is None
+
+
+def test_parse_fields_adds_always_included():
+    assert parse_fields(" summary , flags ") == {"summary", "flags"} | ALWAYS_INCLUDED
+
+
+def test_parse_fields_unknown_raises():
+    with pytest.raises(ValueError, match="Unknown fields: bogus"):
+        parse_fields("summary,bogus")
+
+
+def test_resolve_request_id_keeps_valid_header():
+    assert resolve_request_id("abc-123_XYZ") == "abc-123_XYZ"
+
+
+@pytest.mark.parametrize("header", [None, "", "a" * 129, "bad id", "evil\r\nX: 1", "abc\n", "ünïcode"])
+def test_resolve_request_id_regenerates_invalid_header(header):
+    request_id = resolve_request_id(header)
+    assert request_id != header
+    assert len(request_id) == 32
+
+
+def test_build_uses_provided_request_id():
+    response = build(FakeCrewOutput(NARRATIVE), request_id="client-id")
+    assert response.request_id == "client-id"
+
+
+def test_build_generates_request_id_and_timestamp():
+    first = build(FakeCrewOutput(NARRATIVE))
+    second = build(FakeCrewOutput(NARRATIVE))
+    assert first.request_id != second.request_id
+    assert first.timestamp.tzinfo is not None
+
+
+def test_build_takes_summary_and_flags_from_structured_output():
+    report = DoctorReport(
+        summary="Mild anaemia, everything else is within range.",
+        flags=[MarkerFlag(marker="Hemoglobin", value="11.2 g/dL", reference_range="13.0-17.0", direction="low")],
+        analysis=NARRATIVE,
+    )
+    response = build(FakeCrewOutput(report.model_dump_json(), pydantic=report))
+
+    assert response.summary == "Mild anaemia, everything else is within range."
+    assert [(f.marker, f.direction) for f in response.flags] == [("Hemoglobin", "low")]
+    assert response.analysis == NARRATIVE.strip()
+    assert response.duration_seconds == 1.235
+
+
+def test_build_does_not_guess_flags_from_narrative():
+    response = build(FakeCrewOutput(NARRATIVE))
+
+    # Without structured output nothing is inferred from the prose
+    assert response.summary is None
+    assert response.flags is None
+    assert response.analysis == NARRATIVE.strip()
+
+
+def test_build_collects_task_outputs():
+    crew_output = FakeCrewOutput(
+        NARRATIVE,
+        tasks_output=[FakeTaskOutput("Verifier", " valid report \n"), FakeTaskOutput("Doctor", NARRATIVE)],
+    )
+    response = build(crew_output)
+    assert [(t.agent, t.output) for t in response.tasks] == [
+        ("Verifier", "valid report"),
+        ("Doctor", NARRATIVE.strip()),
+    ]
+
+
+def test_fields_selection_dump():
+    response = build(FakeCrewOutput(NARRATIVE), request_id="rid")
+    payload = response.model_dump(mode="json", include=parse_fields("summary"))
+    assert payload == {"status": "success", "request_id": "rid", "summary": None}